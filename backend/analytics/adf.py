@@ -1,7 +1,9 @@
-from statsmodels.tsa.stattools import adfuller
 import pandas as pd
 
+from backend.metrics import instrument
 
+
+@instrument("analytics.adf")
 def compute_adf(spread: pd.Series, min_samples: int = 50) -> dict:
     """
     Augmented Dickey-Fuller test on spread.
@@ -16,6 +18,9 @@ def compute_adf(spread: pd.Series, min_samples: int = 50) -> dict:
             "min_required": min_samples
         }
 
+    # statsmodels is slow to import; load it only when the test runs
+    from statsmodels.tsa.stattools import adfuller
+
     result = adfuller(spread, regression="c")
 
     return {
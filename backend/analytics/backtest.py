@@ -0,0 +1,179 @@
+import math
+from typing import List, Optional, Sequence, Tuple
+
+from backend.metrics import timed
+
+
+# Bars per year used to annualise the Sharpe ratio
+SHARPE_PERIODS = 252
+
+
+class ZScoreBacktest:
+    """
+    Mean-reversion backtest on the spread: short above +entry_z, long
+    below -entry_z, flat again once |z| <= exit_z.
+
+    Bars are fed in order through `update`, one chunk at a time, so a
+    streamed series is never held in memory. With max_points, the
+    cumulative PnL curve keeps each bucket's low and high plus the
+    first and last bar, and at most one long and one short entry is
+    kept per bucket. n_bars is an upper bound on the bar count, used
+    to size the buckets.
+    """
+
+    def __init__(
+        self,
+        entry_z: float,
+        exit_z: float,
+        position_size: float,
+        max_points: Optional[int] = None,
+        n_bars: Optional[int] = None
+    ):
+        self.entry_z = entry_z
+        self.exit_z = exit_z
+        self.position_size = position_size
+
+        self.bucket_rows = None
+        if max_points is not None and n_bars is not None:
+            n_buckets = max(1, (max_points - 2) // 2)
+            self.bucket_rows = max(1, math.ceil(n_bars / n_buckets))
+
+        self.n = 0
+        self.position = 0
+        self.prev_spread = None
+        self.cum = 0.0
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+        self.trades = 0
+        self.wins = 0
+
+        # Welford running mean / variance of per-bar PnL
+        self.mean = 0.0
+        self.m2 = 0.0
+
+        self.curve: List[dict] = []
+        self.entries: List[dict] = []
+        self._bucket = None
+        self._lo = None
+        self._hi = None
+        self._last = None
+        self._entry_keys = set()
+
+    def update(
+        self,
+        bar_ts: Sequence,
+        spread: Sequence[float],
+        zscore: Sequence[float]
+    ) -> List[Tuple[int, float, float]]:
+        """
+        Advances the backtest over the next bars. Returns
+        (position, pnl, cum_pnl) for each of them.
+        """
+        out = []
+
+        with timed("analytics.backtest"):
+            for ts, s, z in zip(bar_ts, spread, zscore):
+                prev_position = self.position
+
+                if self.prev_spread is None:
+                    pnl = 0.0
+                else:
+                    if self.position == 0:
+                        if z > self.entry_z:
+                            self.position = -1
+                        elif z < -self.entry_z:
+                            self.position = 1
+                    elif abs(z) <= self.exit_z:
+                        self.position = 0
+
+                    pnl = self.position * (s - self.prev_spread)
+
+                self.prev_spread = s
+
+                if self.position != prev_position:
+                    self.trades += 1
+                    if prev_position == 0:
+                        self._add_entry(ts, z)
+
+                if pnl > 0:
+                    self.wins += 1
+
+                self.n += 1
+                delta = pnl - self.mean
+                self.mean += delta / self.n
+                self.m2 += delta * (pnl - self.mean)
+
+                self.cum += pnl * self.position_size
+                self.peak = max(self.peak, self.cum)
+                self.max_drawdown = max(self.max_drawdown, self.peak - self.cum)
+
+                self._add_point(ts, self.cum)
+                out.append((self.position, pnl, self.cum))
+
+        return out
+
+    def _add_entry(self, ts, z: float):
+        side = "long" if self.position == 1 else "short"
+
+        if self.bucket_rows is not None:
+            key = ((self.n // self.bucket_rows), side)
+            if key in self._entry_keys:
+                return
+            self._entry_keys.add(key)
+
+        self.entries.append({"bar_ts": ts, "zscore": z, "side": side})
+
+    def _add_point(self, ts, cum: float):
+        i = self.n - 1
+        point = (i, ts, cum)
+        self._last = point
+
+        if self.bucket_rows is None or i == 0:
+            self.curve.append({"bar_ts": ts, "cum_pnl": cum})
+            return
+
+        bucket = i // self.bucket_rows
+        if bucket != self._bucket:
+            self._flush()
+            self._bucket = bucket
+            self._lo = self._hi = point
+        elif cum < self._lo[2]:
+            self._lo = point
+        elif cum > self._hi[2]:
+            self._hi = point
+
+    def _flush(self):
+        if self._bucket is None:
+            return
+
+        for _, ts, cum in sorted({self._lo, self._hi}, key=lambda p: p[0]):
+            self.curve.append({"bar_ts": ts, "cum_pnl": cum})
+
+        self._bucket = None
+
+    def result(self) -> dict:
+        """
+        Summary metrics, the (decimated) cumulative PnL curve and the
+        entry points.
+        """
+        self._flush()
+
+        # The last bar closes the curve even if its bucket dropped it
+        if self._last is not None and self._last[0] > 0:
+            i, ts, cum = self._last
+            if not self.curve or self.curve[-1]["bar_ts"] != ts:
+                self.curve.append({"bar_ts": ts, "cum_pnl": cum})
+
+        std = math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+        sharpe = self.mean / std * math.sqrt(SHARPE_PERIODS) if std != 0 else 0.0
+
+        return {
+            "bars": self.n,
+            "total_pnl": self.cum,
+            "max_drawdown": self.max_drawdown,
+            "sharpe": sharpe,
+            "trades": self.trades,
+            "win_rate": self.wins / self.trades * 100 if self.trades else 0.0,
+            "cum_pnl": self.curve,
+            "entries": self.entries,
+        }
@@ -1,6 +1,9 @@
 import pandas as pd
 
+from backend.metrics import instrument
 
+
+@instrument("analytics.correlation")
 def compute_rolling_correlation(
     series_x: pd.Series,
     series_y: pd.Series,
@@ -0,0 +1,104 @@
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from backend.metrics import instrument
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: picks n_out row positions that
+    preserve the visual shape of a line. Always keeps the first and
+    last points.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (n_out - 2)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    a = 0
+
+    for i in range(n_out - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+
+        # Average of the next bucket is the third triangle vertex
+        next_start = end
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+
+    selected[-1] = n - 1
+    return selected
+
+
+@instrument("analytics.downsample_lines")
+def downsample_lines(
+    df: pd.DataFrame,
+    x_col: str,
+    y_cols: Sequence[str],
+    max_points: int
+) -> pd.DataFrame:
+    """
+    LTTB-downsamples rows sharing an x axis. Each y column gets an
+    equal share of the point budget and the selected rows are merged,
+    so no series loses its peaks.
+    """
+    if len(df) <= max_points:
+        return df
+
+    x = df[x_col].to_numpy()
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype("datetime64[ns]").astype(np.int64)
+    x = x.astype(np.float64)
+
+    per_series = max(3, max_points // len(y_cols))
+    keep = np.unique(np.concatenate([
+        lttb_indices(x, df[col].to_numpy(dtype=np.float64), per_series)
+        for col in y_cols
+    ]))
+
+    return df.iloc[keep]
+
+
+@instrument("analytics.downsample_ohlc")
+def downsample_ohlc(
+    df: pd.DataFrame,
+    max_points: int
+) -> pd.DataFrame:
+    """
+    Merges consecutive OHLCV bars into at most max_points candles per
+    symbol, preserving each bucket's open, high, low and close.
+    """
+    def bucket(group: pd.DataFrame) -> pd.DataFrame:
+        n = len(group)
+        if n <= max_points:
+            return group
+
+        ids = np.arange(n) * max_points // n
+        return group.groupby(ids).agg(
+            symbol=("symbol", "first"),
+            bar_ts=("bar_ts", "first"),
+            open=("open", "first"),
+            high=("high", "max"),
+            low=("low", "min"),
+            close=("close", "last"),
+            volume=("volume", "sum"),
+        )
+
+    if df.empty:
+        return df
+
+    parts = [bucket(group) for _, group in df.groupby("symbol", sort=False)]
+    return pd.concat(parts).sort_values("bar_ts").reset_index(drop=True)
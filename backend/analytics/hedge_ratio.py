@@ -1,7 +1,10 @@
+import numpy as np
 import pandas as pd
-import statsmodels.api as sm
 
+from backend.metrics import instrument
 
+
+@instrument("analytics.hedge_ratio")
 def compute_hedge_ratio(
     series_x: pd.Series,
     series_y: pd.Series,
@@ -22,22 +25,52 @@ def compute_hedge_ratio(
             "min_required": min_samples
         }
 
-    y = df.iloc[:, 0]
-    x = df.iloc[:, 1]
-
-    x = sm.add_constant(x)
+    y = df.iloc[:, 0].to_numpy(dtype=np.float64)
+    x = df.iloc[:, 1].to_numpy(dtype=np.float64)
 
-    model = sm.OLS(y, x).fit()
+    # Closed-form OLS slope: cov(x, y) / var(x)
+    x_dev = x - x.mean()
+    ss_x = np.dot(x_dev, x_dev)
 
-    # Expecting [const, beta]
-    if len(model.params) < 2:
+    if ss_x == 0 or not np.isfinite(ss_x):
         return {
             "status": "regression_failed",
             "reason": "insufficient variance or rank deficiency",
             "n_obs": len(df)
         }
 
+    beta = np.dot(x_dev, y - y.mean()) / ss_x
+
+    return {
+        "status": "ok",
+        "hedge_ratio": float(beta)
+    }
+
+
+def hedge_ratio_result(
+    n_obs: int,
+    beta,
+    min_samples: int = 30
+) -> dict:
+    """
+    Wraps an externally computed OLS slope (e.g. DuckDB REGR_SLOPE)
+    in the same structured result as compute_hedge_ratio.
+    """
+    if n_obs < min_samples:
+        return {
+            "status": "insufficient_data",
+            "n_obs": n_obs,
+            "min_required": min_samples
+        }
+
+    if beta is None:
+        return {
+            "status": "regression_failed",
+            "reason": "insufficient variance or rank deficiency",
+            "n_obs": n_obs
+        }
+
     return {
         "status": "ok",
-        "hedge_ratio": model.params.iloc[1]
+        "hedge_ratio": beta
     }
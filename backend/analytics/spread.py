@@ -1,6 +1,9 @@
 import pandas as pd
 
+from backend.metrics import instrument
 
+
+@instrument("analytics.spread")
 def compute_spread(
     series_x: pd.Series,
     series_y: pd.Series,
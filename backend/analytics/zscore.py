@@ -1,6 +1,9 @@
 import pandas as pd
 
+from backend.metrics import instrument
 
+
+@instrument("analytics.zscore")
 def compute_zscore(
     spread: pd.Series,
     window: int
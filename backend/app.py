@@ -1,26 +1,152 @@
-from fastapi import FastAPI
-from datetime import datetime, timezone
+import json
+import threading
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from datetime import datetime
 from pathlib import Path
-from backend.replay_engine import TickReplayEngine
+from typing import Iterator, Optional
+from backend.replay_engine import TickReplayEngine, normalize_tick
 from backend.config import DATA_DIR
 from backend.storage import DuckDBStorage
-from backend.config import DB_PATH
-import pandas as pd
+from backend.config import DB_PATH, SERVER_TIMING_ENABLED, PROFILING_ENABLED
+from backend.config import ANALYTICS_ENGINE, ADF_MAX_SAMPLES, WARMUP_ENABLED
+from backend.config import INGEST_BATCH_SIZE
+from backend.metrics import (
+    timed,
+    REQUESTS,
+    start_request_timings,
+    end_request_timings,
+    format_server_timing,
+    render_metrics,
+)
+from backend.profiler import profile_request
+
+# pandas, statsmodels and the backend.analytics modules are imported
+# inside the endpoints that use them, so the app (and its health check)
+# comes up without loading them.
+
+
+class TimedJSONResponse(JSONResponse):
+    """
+    JSONResponse that records serialization time as a stage.
+    """
+
+    def render(self, content) -> bytes:
+        with timed("response.encode"):
+            return super().render(content)
+
 
-from backend.analytics.hedge_ratio import compute_hedge_ratio
-from backend.analytics.spread import compute_spread
-from backend.analytics.zscore import compute_zscore
-from backend.analytics.adf import compute_adf
-from backend.analytics.correlation import compute_rolling_correlation
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts the optional warm-up thread; startup does not wait for it.
+    """
+    if WARMUP_ENABLED:
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+    yield
 
 
 app = FastAPI(
     title="Quant Realtime Analytics Engine",
     description="Realtime tick ingestion, resampling, and quantitative analytics",
     version="0.1.0",
+    default_response_class=TimedJSONResponse,
+    lifespan=lifespan,
 )
 
-storage = DuckDBStorage(DB_PATH)
+_storage = None
+_storage_lock = threading.Lock()
+
+# One ingest at a time, so concurrent calls cannot race on a checkpoint
+_ingest_lock = threading.Lock()
+
+# Smallest max_points accepted for chart downsampling
+MIN_POINTS = 10
+
+# Request metric label for paths that match no route
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def get_storage() -> DuckDBStorage:
+    """
+    Opens the DuckDB connection on first use.
+    """
+    global _storage
+
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                with timed("storage.connect"):
+                    _storage = DuckDBStorage(DB_PATH)
+
+    return _storage
+
+
+def _warm_up():
+    """
+    Imports the analytics stack and opens storage ahead of the first
+    analytics request.
+    """
+    with timed("startup.warm_up"):
+        import backend.analytics.adf
+        import backend.analytics.correlation
+        import backend.analytics.downsample
+        import backend.analytics.hedge_ratio
+        import backend.analytics.spread
+        import backend.analytics.zscore
+        import statsmodels.tsa.stattools
+
+        get_storage()
+
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """
+    Collects per-stage timings for the request and reports them
+    in a Server-Timing header.
+    """
+    timings, token = start_request_timings()
+    status = 500  # unhandled exceptions become 500s further out
+    try:
+        with timed("request.total"):
+            response = await call_next(request)
+        status = response.status_code
+    finally:
+        end_request_timings(token)
+
+        # Label by route template so the label set stays bounded
+        route = request.scope.get("route")
+        REQUESTS.inc(labels=(
+            route.path if route is not None else UNMATCHED_ROUTE,
+            str(status),
+        ))
+
+    if SERVER_TIMING_ENABLED and timings:
+        response.headers["Server-Timing"] = format_server_timing(timings)
+
+    return response
+
+
+def _maybe_profile(profile: bool, func, *args, **kwargs):
+    """
+    Runs func, optionally under the profiler when the request asks
+    for it and profiling is enabled for this deployment.
+    """
+    if not (profile and PROFILING_ENABLED):
+        return func(*args, **kwargs)
+
+    with profile_request() as prof:
+        result = func(*args, **kwargs)
+
+        # Drain streamed payloads so the profile covers the query work
+        if isinstance(result, Iterator):
+            for _ in result:
+                pass
+
+    return PlainTextResponse(prof["report"])
 
 
 @app.get("/")
@@ -31,6 +157,17 @@ def health_check():
         "timestamp": datetime.utcnow().isoformat()
     }
 
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """
+    Prometheus text-format metrics.
+    """
+    return PlainTextResponse(
+        render_metrics(),
+        media_type="text/plain; version=0.0.4",
+    )
+
 @app.get("/replay-test")
 def replay_test(limit: int = 5):
     """
@@ -59,93 +196,281 @@ def replay_test(limit: int = 5):
 
 
 @app.post("/ingest-replay")
-def ingest_replay(limit: int = 1000):
+def ingest_replay(limit: int = 1000, resume: bool = True):
     """
     Replays NDJSON ticks and stores them in DuckDB.
+
+    Ingest is checkpointed per source file: each batch commits together
+    with its file offset, and ticks already stored are skipped, so a
+    retried or interrupted ingest continues where it left off without
+    double-inserting. resume=False discards the checkpoint and restarts
+    from the top of the file (duplicates are still skipped).
     """
     ndjson_file = DATA_DIR / "sample_ticks.ndjson"
     engine = TickReplayEngine(ndjson_file)
+    storage = get_storage()
+    source = ndjson_file.name
 
-    count = 0
+    with _ingest_lock:
+        if not resume:
+            storage.reset_checkpoint(source)
 
-    for tick in engine.replay():
+        checkpoint = storage.get_checkpoint(source)
+        start_offset = checkpoint["file_offset"] if checkpoint else 0
 
-        # --- Symbol ---
-        symbol = tick.get("symbol") or tick.get("s")
-        if symbol is None:
-            continue
+        # File was truncated or replaced since the checkpoint
+        if start_offset > ndjson_file.stat().st_size:
+            start_offset = 0
 
-        # --- Timestamp (already normalized to naive UTC) ---
-        if "ts" in tick:
-            ts = (
-                datetime
-                .fromisoformat(tick["ts"].replace("Z", "+00:00"))
-                .astimezone(timezone.utc)
-                .replace(tzinfo=None)
-            )
-        elif "E" in tick or "T" in tick:
-            ts = datetime.utcfromtimestamp(
-                (tick.get("E") or tick.get("T")) / 1000
-            )
-        else:
-            continue
+        count = 0
+        inserted = 0
+        batch = []
+        offset = start_offset
 
-        # --- Price ---
-        if "price" in tick and tick["price"] is not None:
-            price = float(tick["price"])
-        elif "p" in tick and tick["p"] is not None:
-            price = float(tick["p"])
-        else:
-            continue
+        for offset, tick in engine.replay_from(start_offset):
 
-        # --- Size / Quantity ---
-        if "size" in tick and tick["size"] is not None:
-            size = float(tick["size"])
-        elif "q" in tick and tick["q"] is not None:
-            size = float(tick["q"])
-        else:
-            continue
+            row = normalize_tick(tick)
+            if row is None:
+                continue
 
-        storage.insert_tick({
-            "symbol": symbol,
-            "ts": ts,
-            "price": price,
-            "size": size,
-        })
+            batch.append(row)
+            count += 1
 
-        count += 1
-        if count >= limit:
-            break
+            if len(batch) >= INGEST_BATCH_SIZE:
+                inserted += storage.insert_ticks(batch, source, offset)
+                batch = []
+
+            if count >= limit:
+                break
 
-    return {"ticks_ingested": count}
+        # Final (possibly empty) batch still advances the checkpoint
+        inserted += storage.insert_ticks(batch, source, offset)
+
+    return {
+        "ticks_read": count,
+        "ticks_ingested": inserted,
+        "duplicates_skipped": count - inserted,
+        "start_offset": start_offset,
+        "checkpoint_offset": offset,
+    }
 
 
+@app.get("/ingest-checkpoint")
+def ingest_checkpoint():
+    """
+    Returns the ingest checkpoint for the replay source.
+    """
+    source = (DATA_DIR / "sample_ticks.ndjson").name
+    return get_storage().get_checkpoint(source) or {"source": source}
+
 
 @app.get("/bars/{timeframe}")
-def get_bars(timeframe: str):
+def get_bars(
+    timeframe: str,
+    symbol: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=MIN_POINTS),
+    profile: bool = False
+):
     """
     Returns OHLCV bars for the given timeframe.
+
+    max_points: merge bars into at most this many candles per symbol.
     """
-    df = storage.resample_ohlcv(timeframe)
-    return df.to_dict(orient="records")
+    return _maybe_profile(profile, _bars, timeframe, symbol, max_points)
+
+
+def _bars(timeframe: str, symbol: Optional[str], max_points: Optional[int]):
+    from backend.analytics.downsample import downsample_ohlc
+
+    df = get_storage().resample_ohlcv(timeframe, symbol)
+
+    if max_points is not None:
+        df = downsample_ohlc(df, max_points)
+
+    with timed("pandas.to_records"):
+        return df.to_dict(orient="records")
 
 @app.get("/analytics/pairs")
 def pair_analytics(
     symbol_x: str,
     symbol_y: str,
     timeframe: str = "1m",
-    window: int = 30
+    window: int = Query(30, ge=2),
+    engine: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=MIN_POINTS),
+    entry_z: Optional[float] = Query(None, gt=0),
+    exit_z: float = Query(0.0, ge=0),
+    position_size: float = Query(1000.0, gt=0),
+    profile: bool = False
 ):
     """
     Computes full stat-arb analytics for a symbol pair.
+
+    engine: "pandas" (in-memory) or "duckdb" (window functions in
+    DuckDB, streamed back with bounded memory). Defaults to
+    ANALYTICS_ENGINE.
+    max_points: downsample the returned series (LTTB for pandas,
+    per-bucket min/max of each series in DuckDB). Statistics use every bar.
+    entry_z: also run the z-score backtest on every bar and return its
+    metrics, cumulative PnL curve and entries, downsampled to
+    max_points like the series.
     """
-    df = storage.resample_ohlcv(timeframe)
+    func = _pair_engine(engine)
+    backtest = None
+    if entry_z is not None:
+        backtest = {
+            "entry_z": entry_z,
+            "exit_z": exit_z,
+            "position_size": position_size,
+        }
+
+    result = _maybe_profile(
+        profile, func, symbol_x, symbol_y, timeframe, window, max_points, backtest
+    )
+
+    # The DuckDB engine returns an encoded payload stream
+    if isinstance(result, Iterator):
+        return StreamingResponse(result, media_type="application/json")
+
+    return result
 
-    df_x = df[df["symbol"] == symbol_x].set_index("bar_ts")["close"]
-    df_y = df[df["symbol"] == symbol_y].set_index("bar_ts")["close"]
+
+@app.get("/analytics/pairs/backtest.csv")
+def pair_backtest_csv(
+    symbol_x: str,
+    symbol_y: str,
+    timeframe: str = "1m",
+    window: int = Query(30, ge=2),
+    engine: Optional[str] = None,
+    entry_z: float = Query(2.0, gt=0),
+    exit_z: float = Query(0.0, ge=0),
+    position_size: float = Query(1000.0, gt=0)
+):
+    """
+    Per-bar backtest results as CSV, streamed for download.
+    """
+    from backend.analytics.backtest import ZScoreBacktest
+
+    if _pair_engine(engine) is _pair_analytics_duckdb:
+        chunks = _pair_chunks_duckdb(symbol_x, symbol_y, timeframe, window)
+    else:
+        chunks = _pair_chunks(symbol_x, symbol_y, timeframe, window)
+
+    backtest = ZScoreBacktest(entry_z, exit_z, position_size)
+
+    def rows():
+        yield "bar_ts,spread,zscore,rolling_corr,position,pnl,cum_pnl\n"
+
+        for bar_ts, spread, zscore, corr in chunks:
+            results = backtest.update(bar_ts, spread, zscore)
+            with timed("response.encode"):
+                yield "".join(
+                    f"{ts.isoformat()},{s!r},{z!r},{c!r},{pos},{pnl!r},{cum!r}\n"
+                    for ts, s, z, c, (pos, pnl, cum)
+                    in zip(bar_ts, spread, zscore, corr, results)
+                )
+
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="backtest_results.csv"'},
+    )
+
+
+def _pair_engine(engine: Optional[str]):
+    engine = engine or ANALYTICS_ENGINE
+    if engine not in ("pandas", "duckdb"):
+        raise HTTPException(status_code=400, detail="Invalid engine")
+
+    return _pair_analytics_duckdb if engine == "duckdb" else _pair_analytics
+
+
+def _pair_frame(symbol_x: str, symbol_y: str, timeframe: str, window: int):
+    """
+    Pandas analytics pipeline. Returns (hedge_result, spread, frame);
+    spread and frame are None unless the hedge ratio fit succeeded.
+    """
+    import pandas as pd
+    from backend.analytics.hedge_ratio import compute_hedge_ratio
+    from backend.analytics.spread import compute_spread
+    from backend.analytics.zscore import compute_zscore
+    from backend.analytics.correlation import compute_rolling_correlation
+
+    df = get_storage().resample_ohlcv(timeframe)
+
+    with timed("pandas.filter"):
+        df_x = df[df["symbol"] == symbol_x].set_index("bar_ts")["close"]
+        df_y = df[df["symbol"] == symbol_y].set_index("bar_ts")["close"]
 
     hedge_result = compute_hedge_ratio(df_x, df_y)
 
+    if hedge_result["status"] != "ok":
+        return hedge_result, None, None
+
+    spread = compute_spread(df_x, df_y, hedge_result["hedge_ratio"])
+    zscore = compute_zscore(spread, window)
+    corr = compute_rolling_correlation(df_x, df_y, window)
+
+    with timed("pandas.concat"):
+        result = pd.concat(
+            [spread, zscore, corr],
+            axis=1
+        ).dropna().reset_index()
+
+    return hedge_result, spread, result
+
+
+def _pair_chunks(symbol_x: str, symbol_y: str, timeframe: str, window: int):
+    """
+    (bar_ts, spread, zscore, rolling_corr) column lists from the
+    pandas pipeline, as a single chunk.
+    """
+    _, _, result = _pair_frame(symbol_x, symbol_y, timeframe, window)
+
+    if result is not None and len(result):
+        yield (
+            result["bar_ts"].dt.to_pydatetime().tolist(),
+            result["spread"].tolist(),
+            result["zscore"].tolist(),
+            result["rolling_corr"].tolist(),
+        )
+
+
+def _pair_chunks_duckdb(symbol_x: str, symbol_y: str, timeframe: str, window: int):
+    """
+    (bar_ts, spread, zscore, rolling_corr) column lists, one per
+    Arrow record batch scanned from DuckDB.
+    """
+    from backend.analytics.hedge_ratio import hedge_ratio_result
+
+    pair = get_storage().open_pair(symbol_x, symbol_y, timeframe)
+    try:
+        hedge_result = hedge_ratio_result(*pair.hedge_ratio())
+        if hedge_result["status"] != "ok":
+            return
+
+        for batch in pair.scan_analytics(hedge_result["hedge_ratio"], window):
+            yield tuple(batch.column(i).to_pylist() for i in range(4))
+    finally:
+        pair.close()
+
+
+def _pair_analytics(
+    symbol_x: str,
+    symbol_y: str,
+    timeframe: str,
+    window: int,
+    max_points: Optional[int],
+    backtest: Optional[dict] = None
+):
+    from backend.analytics.adf import compute_adf
+    from backend.analytics.backtest import ZScoreBacktest
+    from backend.analytics.downsample import downsample_lines
+
+    hedge_result, spread, result = _pair_frame(
+        symbol_x, symbol_y, timeframe, window
+    )
+
     if hedge_result["status"] != "ok":
         return {
             "hedge_ratio": hedge_result,
@@ -153,20 +478,129 @@ def pair_analytics(
             "data": []
         }
 
-    hedge_ratio = hedge_result["hedge_ratio"]
-
-    spread = compute_spread(df_x, df_y, hedge_ratio)
-    zscore = compute_zscore(spread, window)
-    corr = compute_rolling_correlation(df_x, df_y, window)
     adf = compute_adf(spread)
 
-    result = pd.concat(
-        [spread, zscore, corr],
-        axis=1
-    ).dropna()
+    payload = {
+        "hedge_ratio": hedge_result["hedge_ratio"],
+        "adf": adf,
+    }
+
+    if backtest is not None:
+        bt = ZScoreBacktest(**backtest, max_points=max_points, n_bars=len(result))
+        bt.update(
+            result["bar_ts"].tolist(),
+            result["spread"].tolist(),
+            result["zscore"].tolist(),
+        )
+        payload["backtest"] = bt.result()
+
+    downsampled = max_points is not None and len(result) > max_points
+    if downsampled:
+        result = downsample_lines(
+            result, "bar_ts", ["spread", "zscore", "rolling_corr"], max_points
+        )
+
+    with timed("pandas.to_records"):
+        data = result.to_dict(orient="records")
 
     return {
-        "hedge_ratio": hedge_ratio,
-        "adf": adf,
-        "data": result.reset_index().to_dict(orient="records")
+        **payload,
+        "downsampled": downsampled,
+        "data": data
     }
+
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    return float(obj)
+
+
+def _stream_pair_payload(
+    hedge_ratio: float,
+    adf: dict,
+    backtest: Optional[dict],
+    downsampled: bool,
+    batches
+):
+    """
+    Encodes the analytics payload incrementally, one record batch at
+    a time, so the full result never sits in memory.
+    """
+    head = '{"hedge_ratio": ' + json.dumps(hedge_ratio)
+    head += ', "adf": ' + json.dumps(adf, default=_json_default)
+    if backtest is not None:
+        head += ', "backtest": ' + json.dumps(backtest, default=_json_default)
+    head += ', "downsampled": ' + json.dumps(downsampled) + ', "data": ['
+
+    yield head
+
+    first = True
+    for batch in batches:
+        with timed("response.encode"):
+            chunk = ",".join(
+                json.dumps(row, default=_json_default)
+                for row in batch.to_pylist()
+            )
+
+        if not chunk:
+            continue
+
+        yield chunk if first else "," + chunk
+        first = False
+
+    yield "]}"
+
+
+def _pair_analytics_duckdb(
+    symbol_x: str,
+    symbol_y: str,
+    timeframe: str,
+    window: int,
+    max_points: Optional[int],
+    backtest: Optional[dict] = None
+):
+    from backend.analytics.hedge_ratio import hedge_ratio_result
+    from backend.analytics.adf import compute_adf
+    from backend.analytics.backtest import ZScoreBacktest
+
+    pair = get_storage().open_pair(symbol_x, symbol_y, timeframe)
+    streaming = False
+    try:
+        n_obs, beta = pair.hedge_ratio()
+        hedge_result = hedge_ratio_result(n_obs, beta)
+
+        if hedge_result["status"] != "ok":
+            return {
+                "hedge_ratio": hedge_result,
+                "adf": {"status": "skipped"},
+                "data": []
+            }
+
+        hedge_ratio = hedge_result["hedge_ratio"]
+
+        # ADF runs on the most recent bars only to keep memory bounded
+        tail = pair.spread_tail(hedge_ratio, ADF_MAX_SAMPLES)
+        adf = compute_adf(tail)
+
+        # The backtest needs every bar: one full scan, batch by batch
+        if backtest is not None:
+            bt = ZScoreBacktest(**backtest, max_points=max_points, n_bars=n_obs)
+            for batch in pair.scan_analytics(hedge_ratio, window):
+                bt.update(
+                    batch.column("bar_ts").to_pylist(),
+                    batch.column("spread").to_pylist(),
+                    batch.column("zscore").to_pylist(),
+                )
+            backtest = bt.result()
+
+        downsampled, batches = pair.stream_analytics(
+            hedge_ratio, window, max_points
+        )
+        streaming = True
+    finally:
+        # Once streaming, the batch iterator closes the pair
+        if not streaming:
+            pair.close()
+
+    return _stream_pair_payload(hedge_ratio, adf, backtest, downsampled, batches)
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -5,6 +6,28 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 DATA_DIR.mkdir(exist_ok=True)
 
-DB_PATH = DATA_DIR / "market_data.duckdb"
+DB_PATH = Path(os.getenv("QRA_DB_PATH", DATA_DIR / "market_data.duckdb"))
 
 TICK_REPLAY_SPEED = 1.0  # 1.0 = real-time
+INGEST_BATCH_SIZE = 5_000  # ticks per checkpointed ingest transaction
+
+# --- DuckDB ---
+# Caps DuckDB's buffer pool; larger sorts, joins and windows spill to
+# DUCKDB_TEMP_DIR instead of growing the process.
+DUCKDB_MEMORY_LIMIT = os.getenv("QRA_DUCKDB_MEMORY_LIMIT", "1GB")
+DUCKDB_TEMP_DIR = Path(os.getenv("QRA_DUCKDB_TEMP_DIR", DATA_DIR / "duckdb_tmp"))
+
+# --- Instrumentation ---
+SERVER_TIMING_ENABLED = os.getenv("QRA_SERVER_TIMING", "0") == "1"
+PROFILING_ENABLED = os.getenv("QRA_PROFILING", "0") == "1"  # allows ?profile=1
+
+# --- Startup ---
+# Opt-in: load the analytics stack and open DuckDB on a background
+# thread after startup, instead of on the first analytics request.
+WARMUP_ENABLED = os.getenv("QRA_WARMUP", "0") == "1"
+
+# --- Analytics ---
+# "pandas" loads resampled bars into memory; "duckdb" pushes rolling
+# windows into DuckDB and streams results in Arrow record batches.
+ANALYTICS_ENGINE = os.getenv("QRA_ANALYTICS_ENGINE", "pandas")
+ADF_MAX_SAMPLES = 10_000  # most recent spread values tested in duckdb mode
@@ -0,0 +1,220 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Iterator, Optional, Tuple
+
+
+# Latency buckets in seconds, from sub-millisecond decode/insert calls
+# up to multi-second analytics requests.
+DEFAULT_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Per-request stage totals (ms), populated while a request is in flight
+# and rendered into the Server-Timing header.
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def _escape_label(value: str) -> str:
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+    return (
+        value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+class Histogram:
+    """
+    Cumulative latency histogram keyed by stage name.
+    """
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # stage -> (bucket counts, sum, count)
+        self._series: Dict[str, list] = {}
+
+    def observe(self, stage: str, value: float):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(stage)
+            if series is None:
+                series = [[0] * len(self.buckets), 0.0, 0]
+                self._series[stage] = series
+            if idx < len(self.buckets):
+                series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            snapshot = {
+                k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()
+            }
+
+        for stage, (counts, total, count) in sorted(snapshot.items()):
+            stage = _escape_label(stage)
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                lines.append(
+                    f'{self.name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{self.name}_bucket{{stage="{stage}",le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{self.name}_count{{stage="{stage}"}} {count}')
+
+        return "\n".join(lines)
+
+
+class Counter:
+    """
+    Monotonic counter keyed by optional label values.
+    """
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, labels: Tuple[str, ...] = ()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+        ]
+        with self._lock:
+            snapshot = dict(self._values)
+
+        for label_values, value in sorted(snapshot.items()):
+            if self.labels:
+                pairs = ",".join(
+                    f'{name}="{_escape_label(v)}"'
+                    for name, v in zip(self.labels, label_values)
+                )
+                lines.append(f"{self.name}{{{pairs}}} {value}")
+            else:
+                lines.append(f"{self.name} {value}")
+
+        return "\n".join(lines)
+
+
+STAGE_DURATION = Histogram(
+    "quant_stage_duration_seconds",
+    "Wall-clock time spent in an instrumented stage.",
+)
+
+TICKS_DECODED = Counter(
+    "quant_replay_ticks_decoded_total",
+    "NDJSON ticks decoded by the replay engine.",
+)
+
+TICKS_INGESTED = Counter(
+    "quant_ingest_ticks_total",
+    "Ticks inserted into storage.",
+)
+
+TICKS_DUPLICATE = Counter(
+    "quant_ingest_duplicates_total",
+    "Ticks skipped on ingest because they were already stored.",
+)
+
+REQUESTS = Counter(
+    "quant_http_requests_total",
+    "HTTP requests served, by route template and status code.",
+    labels=("path", "status"),
+)
+
+_REGISTRY = (
+    STAGE_DURATION, TICKS_DECODED, TICKS_INGESTED, TICKS_DUPLICATE, REQUESTS
+)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """
+    Times the enclosed block into STAGE_DURATION and, when a request
+    is in flight, into its Server-Timing totals.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_duration(stage, time.perf_counter() - start)
+
+
+def record_duration(stage: str, elapsed: float):
+    """
+    Records an already measured duration, for hot loops that
+    accumulate time locally and report it once per batch.
+    """
+    STAGE_DURATION.observe(stage, elapsed)
+
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + elapsed * 1000.0
+
+
+def instrument(stage: str):
+    """
+    Decorator form of `timed`.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_request_timings() -> Tuple[Dict[str, float], object]:
+    """
+    Begins collecting stage timings for the current request.
+    Returns the timings dict and a token for `end_request_timings`.
+    """
+    timings: Dict[str, float] = {}
+    token = _request_timings.set(timings)
+    return timings, token
+
+
+def end_request_timings(token):
+    _request_timings.reset(token)
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """
+    Renders stage totals as a Server-Timing header value.
+    Stage names use '.' separators, which are not valid tokens there.
+    """
+    return ", ".join(
+        f"{stage.replace('.', '_')};dur={ms:.3f}"
+        for stage, ms in timings.items()
+    )
+
+
+def render_metrics() -> str:
+    """
+    Prometheus text exposition of every registered metric.
+    """
+    return "\n".join(m.render() for m in _REGISTRY) + "\n"
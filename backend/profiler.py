@@ -0,0 +1,45 @@
+import io
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+@contextmanager
+def profile_request() -> Iterator[Dict]:
+    """
+    Profiles the enclosed block and stores a text report in the
+    yielded dict under "report".
+
+    Uses the pyinstrument sampling profiler when it is installed,
+    otherwise falls back to the stdlib deterministic cProfile.
+    """
+    result: Dict = {}
+
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+
+    if Profiler is not None:
+        profiler = Profiler(async_mode="disabled")
+        profiler.start()
+        try:
+            yield result
+        finally:
+            profiler.stop()
+            result["profiler"] = "pyinstrument"
+            result["report"] = profiler.output_text(unicode=False, color=False)
+        return
+
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        buf = io.StringIO()
+        pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(40)
+        result["profiler"] = "cProfile"
+        result["report"] = buf.getvalue()
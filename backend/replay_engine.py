@@ -1,10 +1,15 @@
 import json
 import time
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterator, Dict
+from typing import Iterator, Dict, Optional, Tuple
 
 from backend.config import TICK_REPLAY_SPEED
+from backend.metrics import record_duration, TICKS_DECODED
+
+# Decoded ticks between metric updates; per-tick updates cost as much
+# as the decode itself.
+DECODE_REPORT_EVERY = 10_000
 
 
 class TickReplayEngine:
@@ -20,23 +25,59 @@ class TickReplayEngine:
         if not self.ndjson_path.exists():
             raise FileNotFoundError(f"NDJSON file not found: {self.ndjson_path}")
 
-    def _read_ticks(self) -> Iterator[Dict]:
+    def read_ticks(self, start_offset: int = 0) -> Iterator[Tuple[int, Dict]]:
         """
-        Reads ticks line-by-line from NDJSON.
+        Reads ticks line-by-line from NDJSON, starting at a byte offset,
+        without replay pacing.
+        Yields (offset just past the tick's line, tick).
+
+        Decode time and count are reported every DECODE_REPORT_EVERY
+        ticks and when the reader stops.
         """
-        with open(self.ndjson_path, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    yield json.loads(line)
+        offset = start_offset
+        decoded = 0
+        decode_seconds = 0.0
+        perf_counter = time.perf_counter
+
+        try:
+            with open(self.ndjson_path, "rb") as f:
+                f.seek(start_offset)
+                for line in f:
+                    offset += len(line)
+                    if line.strip():
+                        t0 = perf_counter()
+                        tick = json.loads(line)
+                        decode_seconds += perf_counter() - t0
+                        decoded += 1
+
+                        if decoded >= DECODE_REPORT_EVERY:
+                            record_duration("replay.decode", decode_seconds)
+                            TICKS_DECODED.inc(decoded)
+                            decoded = 0
+                            decode_seconds = 0.0
+
+                        yield offset, tick
+        finally:
+            if decoded:
+                record_duration("replay.decode", decode_seconds)
+                TICKS_DECODED.inc(decoded)
 
     def replay(self) -> Iterator[Dict]:
         """
         Generator that yields ticks respecting original timestamps.
         Supports epoch-ms and ISO-8601 timestamps.
         """
+        for _, tick in self.replay_from(0):
+            yield tick
+
+    def replay_from(self, start_offset: int) -> Iterator[Tuple[int, Dict]]:
+        """
+        Like replay(), but resumes at a byte offset and yields
+        (offset just past the tick's line, tick) for checkpointing.
+        """
         prev_event_time = None
 
-        for tick in self._read_ticks():
+        for offset, tick in self.read_ticks(start_offset):
 
             # --- Timestamp normalization ---
             if "E" in tick or "T" in tick:
@@ -59,4 +100,57 @@ class TickReplayEngine:
                 time.sleep(sleep_time)
 
             prev_event_time = event_time
-            yield tick
+            yield offset, tick
+
+
+def normalize_tick(tick: Dict) -> Optional[Dict]:
+    """
+    Maps a raw NDJSON tick onto a storage row.
+    Returns None if the tick is missing a required field.
+    """
+    # --- Symbol ---
+    symbol = tick.get("symbol") or tick.get("s")
+    if symbol is None:
+        return None
+
+    # --- Timestamp (normalized to naive UTC) ---
+    if "ts" in tick:
+        ts = (
+            datetime
+            .fromisoformat(tick["ts"].replace("Z", "+00:00"))
+            .astimezone(timezone.utc)
+            .replace(tzinfo=None)
+        )
+    elif "E" in tick or "T" in tick:
+        ts = datetime.utcfromtimestamp(
+            (tick.get("E") or tick.get("T")) / 1000
+        )
+    else:
+        return None
+
+    # --- Price ---
+    if "price" in tick and tick["price"] is not None:
+        price = float(tick["price"])
+    elif "p" in tick and tick["p"] is not None:
+        price = float(tick["p"])
+    else:
+        return None
+
+    # --- Size / Quantity ---
+    if "size" in tick and tick["size"] is not None:
+        size = float(tick["size"])
+    elif "q" in tick and tick["q"] is not None:
+        size = float(tick["q"])
+    else:
+        return None
+
+    # --- Trade id (optional, used for deduplication) ---
+    trade_id = tick.get("trade_id", tick.get("t"))
+
+    return {
+        "symbol": symbol,
+        "ts": ts,
+        "price": price,
+        "size": size,
+        "trade_id": int(trade_id) if trade_id is not None else None,
+    }
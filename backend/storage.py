@@ -1,7 +1,57 @@
-import duckdb
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
+from itertools import chain
+
+from backend.config import DUCKDB_MEMORY_LIMIT, DUCKDB_TEMP_DIR
+from backend.metrics import timed, TICKS_INGESTED, TICKS_DUPLICATE
+
+
+INTERVAL_MAP = {
+    "1s": "1 second",
+    "1m": "1 minute",
+    "5m": "5 minutes"
+}
+
+# Rows per Arrow record batch when streaming windowed analytics
+RECORD_BATCH_ROWS = 50_000
+
+# Series returned by the pair analytics stream, in column order
+PAIR_SERIES = ("spread", "zscore", "rolling_corr")
+
+
+def _interval(timeframe: str) -> str:
+    if timeframe not in INTERVAL_MAP:
+        raise ValueError("Invalid timeframe")
+
+    return INTERVAL_MAP[timeframe]
+
+
+def _pair_closes_sql(interval: str) -> str:
+    """
+    CTEs yielding aligned close prices (bar_ts, x, y) for a symbol
+    pair, resampled in DuckDB. Expects $symbol_x / $symbol_y params.
+    """
+    return f"""
+        WITH bars AS (
+            SELECT
+                symbol,
+                time_bucket(INTERVAL '{interval}', ts) AS bar_ts,
+                LAST(price) AS close
+            FROM ticks
+            WHERE symbol = $symbol_x OR symbol = $symbol_y
+            GROUP BY symbol, bar_ts
+        ),
+        pair AS (
+            SELECT bar_x.bar_ts, bar_x.close AS x, bar_y.close AS y
+            FROM bars bar_x
+            JOIN bars bar_y ON bar_x.bar_ts = bar_y.bar_ts
+            WHERE bar_x.symbol = $symbol_x
+              AND bar_y.symbol = $symbol_y
+              AND bar_x.close IS NOT NULL
+              AND bar_y.close IS NOT NULL
+        )
+    """
 
 
 class DuckDBStorage:
@@ -9,8 +59,19 @@ class DuckDBStorage:
     Handles persistent storage of raw ticks and OHLCV bars.
     """
 
-    def __init__(self, db_path: Path):
-        self.conn = duckdb.connect(db_path)
+    def __init__(
+        self,
+        db_path: Path,
+        memory_limit: str = DUCKDB_MEMORY_LIMIT,
+        temp_directory: Path = DUCKDB_TEMP_DIR
+    ):
+        import duckdb
+
+        # Bounded buffer pool; operators that outgrow it spill to disk
+        self.conn = duckdb.connect(str(db_path), config={
+            "memory_limit": memory_limit,
+            "temp_directory": str(temp_directory),
+        })
         self._init_tables()
 
     def _init_tables(self):
@@ -20,36 +81,162 @@ class DuckDBStorage:
                 symbol TEXT,
                 ts TIMESTAMP,
                 price DOUBLE,
-                size DOUBLE
+                size DOUBLE,
+                trade_id BIGINT
             )
         """)
 
-    def insert_tick(self, tick: Dict):
+        # Databases created before trade ids were stored
         self.conn.execute(
-            "INSERT INTO ticks VALUES (?, ?, ?, ?)",
-            (
-                tick["symbol"],
-                tick["ts"],
-                tick["price"],
-                tick["size"]
-            )
+            "ALTER TABLE ticks ADD COLUMN IF NOT EXISTS trade_id BIGINT"
         )
 
-    def resample_ohlcv(self, timeframe: str):
+        # Resume point per ingest source
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                source TEXT PRIMARY KEY,
+                file_offset BIGINT,
+                last_event_ts TIMESTAMP,
+                ticks_ingested BIGINT,
+                updated_at TIMESTAMP
+            )
+        """)
+
+    def insert_ticks(
+        self,
+        ticks: List[Dict],
+        source: Optional[str] = None,
+        file_offset: Optional[int] = None
+    ) -> int:
         """
-        Resample raw ticks into OHLCV bars.
-        timeframe: '1s', '1m', '5m'
+        Idempotent bulk insert. Ticks already stored are dropped with
+        one anti-join: matched on (symbol, ts, trade_id), or on
+        (symbol, ts, price, size) when either side has no trade id
+        (including rows stored before trade ids were kept). Rows are
+        inserted in batch order, which FIRST/LAST in the bar queries
+        rely on.
+
+        When source is given, its checkpoint advances to file_offset in
+        the same transaction, so a batch and its checkpoint commit
+        together. Returns the number of ticks inserted.
+        """
+        import pyarrow as pa
+
+        cursor = self.conn.cursor()
+        try:
+            with timed("storage.insert_ticks"):
+                cursor.execute("BEGIN TRANSACTION")
+
+                inserted = 0
+                if ticks:
+                    staging = pa.table({
+                        "symbol": pa.array([t["symbol"] for t in ticks], pa.string()),
+                        "ts": pa.array([t["ts"] for t in ticks], pa.timestamp("us")),
+                        "price": pa.array([t["price"] for t in ticks], pa.float64()),
+                        "size": pa.array([t["size"] for t in ticks], pa.float64()),
+                        "trade_id": pa.array([t.get("trade_id") for t in ticks], pa.int64()),
+                        "seq": pa.array(range(len(ticks)), pa.int64()),
+                    })
+                    cursor.register("staging_ticks", staging)
+
+                    # Only stored ticks inside the batch's time range can
+                    # collide; the range filter lets DuckDB skip the rest.
+                    inserted = cursor.execute("""
+                        INSERT INTO ticks (symbol, ts, price, size, trade_id)
+                        SELECT s.symbol, s.ts, s.price, s.size, s.trade_id
+                        FROM staging_ticks s
+                        ANTI JOIN (
+                            SELECT symbol, ts, price, size, trade_id
+                            FROM ticks
+                            WHERE ts BETWEEN (SELECT MIN(ts) FROM staging_ticks)
+                                         AND (SELECT MAX(ts) FROM staging_ticks)
+                        ) t
+                        ON t.symbol = s.symbol
+                           AND t.ts = s.ts
+                           AND (
+                               t.trade_id = s.trade_id
+                               OR (
+                                   (t.trade_id IS NULL OR s.trade_id IS NULL)
+                                   AND t.price = s.price
+                                   AND t.size = s.size
+                               )
+                           )
+                        -- Duplicates within the batch keep their first copy
+                        QUALIFY ROW_NUMBER() OVER (
+                            PARTITION BY s.symbol, s.ts, s.price, s.size, s.trade_id
+                            ORDER BY s.seq
+                        ) = 1
+                        ORDER BY s.seq
+                    """).fetchone()[0]
+
+                    cursor.unregister("staging_ticks")
+
+                if source is not None:
+                    last_event_ts = max(t["ts"] for t in ticks) if ticks else None
+                    cursor.execute("""
+                        INSERT INTO ingest_checkpoints
+                        VALUES (?, ?, ?, ?, now()::TIMESTAMP)
+                        ON CONFLICT (source) DO UPDATE SET
+                            file_offset = excluded.file_offset,
+                            last_event_ts = COALESCE(
+                                GREATEST(ingest_checkpoints.last_event_ts, excluded.last_event_ts),
+                                ingest_checkpoints.last_event_ts,
+                                excluded.last_event_ts
+                            ),
+                            ticks_ingested = ingest_checkpoints.ticks_ingested + excluded.ticks_ingested,
+                            updated_at = excluded.updated_at
+                    """, (source, file_offset, last_event_ts, inserted))
+
+                cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.close()
+
+        TICKS_INGESTED.inc(inserted)
+        TICKS_DUPLICATE.inc(len(ticks) - inserted)
+
+        return inserted
+
+    def get_checkpoint(self, source: str) -> Optional[Dict]:
+        """
+        Last committed ingest checkpoint for a source, or None.
         """
-        interval_map = {
-            "1s": "1 second",
-            "1m": "1 minute",
-            "5m": "5 minutes"
+        row = self.conn.execute(
+            """
+            SELECT file_offset, last_event_ts, ticks_ingested, updated_at
+            FROM ingest_checkpoints
+            WHERE source = ?
+            """,
+            (source,)
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            "source": source,
+            "file_offset": row[0],
+            "last_event_ts": row[1],
+            "ticks_ingested": row[2],
+            "updated_at": row[3],
         }
 
-        if timeframe not in interval_map:
-            raise ValueError("Invalid timeframe")
+    def reset_checkpoint(self, source: str):
+        self.conn.execute(
+            "DELETE FROM ingest_checkpoints WHERE source = ?", (source,)
+        )
 
-        interval = interval_map[timeframe]
+    def resample_ohlcv(self, timeframe: str, symbol: Optional[str] = None):
+        """
+        Resample raw ticks into OHLCV bars.
+        timeframe: '1s', '1m', '5m'
+        symbol: restrict to a single symbol (all symbols if None)
+        """
+        interval = _interval(timeframe)
+        where = "WHERE symbol = ?" if symbol is not None else ""
+        params = [symbol] if symbol is not None else []
 
         query = f"""
             SELECT
@@ -61,8 +248,232 @@ class DuckDBStorage:
                 LAST(price) AS close,
                 SUM(size) AS volume
             FROM ticks
+            {where}
             GROUP BY symbol, bar_ts
             ORDER BY bar_ts
         """
 
-        return self.conn.execute(query).fetchdf()
+        with timed("storage.resample_ohlcv"):
+            return self.conn.execute(query, params).fetchdf()
+
+    def open_pair(self, symbol_x: str, symbol_y: str, timeframe: str) -> "PairCloses":
+        """
+        Resamples a symbol pair once into aligned closes for the
+        queries of a single request. Close the result when done.
+        """
+        query = _pair_closes_sql(_interval(timeframe)) + """
+            SELECT * FROM pair ORDER BY bar_ts
+        """
+
+        cursor = self.conn.cursor()
+        try:
+            with timed("storage.open_pair"):
+                cursor.execute(
+                    f"CREATE TEMP TABLE {PairCloses.TABLE} AS {query}",
+                    {"symbol_x": symbol_x, "symbol_y": symbol_y},
+                )
+        except Exception:
+            cursor.close()
+            raise
+
+        return PairCloses(cursor)
+
+
+class PairCloses:
+    """
+    Aligned close prices (bar_ts, x, y) for a symbol pair, held in a
+    temp table on a dedicated cursor. Temp tables are scoped to their
+    cursor, so concurrent requests each see only their own pair.
+    """
+
+    TABLE = "pair_closes"
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def close(self):
+        try:
+            self.cursor.execute(f"DROP TABLE IF EXISTS {self.TABLE}")
+        finally:
+            self.cursor.close()
+
+    def hedge_ratio(self) -> Tuple[int, Optional[float]]:
+        """
+        OLS slope of X ~ alpha + beta * Y over aligned closes,
+        computed in DuckDB. Returns (n_obs, beta).
+        """
+        with timed("storage.pair_hedge_ratio"):
+            n_obs, beta = self.cursor.execute(
+                f"SELECT COUNT(*), REGR_SLOPE(x, y) FROM {self.TABLE}"
+            ).fetchone()
+
+        return n_obs, beta
+
+    def spread_tail(self, hedge_ratio: float, limit: int):
+        """
+        Most recent `limit` spread values, oldest first.
+        """
+        query = f"""
+            SELECT bar_ts, spread FROM (
+                SELECT bar_ts, x - $hedge_ratio * y AS spread
+                FROM {self.TABLE}
+                ORDER BY bar_ts DESC
+                LIMIT $limit
+            )
+            ORDER BY bar_ts
+        """
+
+        params = {"hedge_ratio": hedge_ratio, "limit": limit}
+
+        with timed("storage.pair_spread_tail"):
+            return self.cursor.execute(query, params).fetchdf().set_index("bar_ts")["spread"]
+
+    def _windowed_sql(self, window: int) -> str:
+        """
+        CTEs spread -> windowed -> filtered over the pair's closes.
+        Expects a $hedge_ratio param.
+        """
+        return f"""
+            WITH spread AS (
+                SELECT bar_ts, x, y, x - $hedge_ratio * y AS spread
+                FROM {self.TABLE}
+            ),
+            windowed AS (
+                SELECT
+                    bar_ts,
+                    spread,
+                    (spread - AVG(spread) OVER w)
+                        / NULLIF(STDDEV_SAMP(spread) OVER w, 0) AS zscore,
+                    CORR(x, y) OVER w AS rolling_corr,
+                    COUNT(*) OVER w AS n
+                FROM spread
+                WINDOW w AS (
+                    ORDER BY bar_ts
+                    ROWS BETWEEN {int(window) - 1} PRECEDING AND CURRENT ROW
+                )
+            ),
+            filtered AS (
+                SELECT bar_ts, spread, zscore, rolling_corr
+                FROM windowed
+                WHERE n = {int(window)}
+                  AND zscore IS NOT NULL
+                  AND rolling_corr IS NOT NULL
+                  AND isfinite(rolling_corr)
+            )
+        """
+
+    def scan_analytics(
+        self,
+        hedge_ratio: float,
+        window: int,
+        batch_rows: int = RECORD_BATCH_ROWS
+    ):
+        """
+        Every row of the analytics series in Arrow record batches, for
+        consumers that need all bars (e.g. the backtest). Exhaust it
+        before running another query on this pair.
+        """
+        query = self._windowed_sql(window) + """
+            SELECT * FROM filtered ORDER BY bar_ts
+        """
+
+        with timed("storage.scan_pair_analytics.execute"):
+            reader = self.cursor.execute(
+                query, {"hedge_ratio": hedge_ratio}
+            ).fetch_record_batch(batch_rows)
+
+        yield from reader
+
+    def stream_analytics(
+        self,
+        hedge_ratio: float,
+        window: int,
+        max_points: Optional[int] = None,
+        batch_rows: int = RECORD_BATCH_ROWS
+    ):
+        """
+        Spread, rolling z-score and rolling correlation computed with
+        DuckDB window functions. The query is executed before this
+        returns.
+
+        Matches the pandas path: rows are emitted once a full window
+        is available and rows with undefined z-score/correlation are
+        dropped. With max_points, rows are decimated in DuckDB keeping
+        the first and last rows and each bucket's extremes of every
+        series.
+
+        Returns (downsampled, batches): whether decimation dropped any
+        rows, and an iterator of Arrow record batches. The iterator
+        takes ownership of the pair and closes it once exhausted.
+        """
+        query = self._windowed_sql(window)
+
+        if max_points is None:
+            query += """
+                SELECT * FROM filtered ORDER BY bar_ts
+            """
+        else:
+            # Min/max-preserving decimation: every series keeps its
+            # lowest and highest row per equal-count bucket, and the
+            # first and last rows are always kept
+            n_buckets = max(1, (int(max_points) - 2) // (2 * len(PAIR_SERIES)))
+            ranks = ",\n".join(
+                f"ROW_NUMBER() OVER (PARTITION BY bucket ORDER BY {col} {order}) AS r_{col}_{order}"
+                for col in PAIR_SERIES for order in ("ASC", "DESC")
+            )
+            extremes = " OR ".join(
+                f"r_{col}_{order} = 1"
+                for col in PAIR_SERIES for order in ("ASC", "DESC")
+            )
+            query += f"""
+                , numbered AS (
+                    SELECT *,
+                        ROW_NUMBER() OVER (ORDER BY bar_ts) AS rn,
+                        COUNT(*) OVER () AS n_total
+                    FROM filtered
+                ),
+                ranked AS (
+                    SELECT *, {ranks}
+                    FROM (
+                        SELECT *, (rn - 1) * {n_buckets} // n_total AS bucket
+                        FROM numbered
+                    )
+                )
+                SELECT bar_ts, spread, zscore, rolling_corr, n_total
+                FROM ranked
+                WHERE n_total <= {int(max_points)}
+                   OR rn = 1
+                   OR rn = n_total
+                   OR {extremes}
+                ORDER BY bar_ts
+            """
+
+        import pyarrow as pa
+
+        with timed("storage.stream_pair_analytics.execute"):
+            reader = self.cursor.execute(
+                query, {"hedge_ratio": hedge_ratio}
+            ).fetch_record_batch(batch_rows)
+            # The windowed plan runs on the first fetch; pull it here
+            # so query errors surface before the response starts.
+            first = next(iter(reader), None)
+
+        downsampled = False
+        if max_points is not None and first is not None:
+            downsampled = first.column(4)[0].as_py() > max_points
+
+        def batches():
+            try:
+                if first is None:
+                    return
+                for batch in chain([first], reader):
+                    # Drop the n_total helper column
+                    if batch.num_columns > 4:
+                        batch = pa.RecordBatch.from_arrays(
+                            batch.columns[:4], names=batch.schema.names[:4]
+                        )
+                    yield batch
+            finally:
+                self.close()
+
+        return downsampled, batches()
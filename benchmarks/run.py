@@ -0,0 +1,415 @@
+"""
+Benchmark harness for ingest, resampling, analytics and API latency.
+
+Each tick count runs in its own subprocess so peak RSS is per size:
+
+    python -m benchmarks.run --sizes 1000000,10000000,100000000
+
+Results are written as JSON; pass --compare to diff against a
+previous run.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.synthetic_ticks import generate_ticks, DEFAULT_SYMBOLS
+
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BASE_DIR / "benchmarks" / "results"
+
+TIMEFRAMES = ("1s", "1m", "5m")
+
+
+def _percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _latency_summary(samples) -> dict:
+    return {
+        "n": len(samples),
+        "p50_ms": _percentile(samples, 50) * 1000.0,
+        "p99_ms": _percentile(samples, 99) * 1000.0,
+        "mean_ms": statistics.fmean(samples) * 1000.0,
+    }
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        rss /= 1024
+    return rss / 1024.0
+
+
+def _proc_peak_rss_mb(pid: int):
+    status = Path(f"/proc/{pid}/status")
+    if not status.exists():
+        return None
+    for line in status.read_text().splitlines():
+        if line.startswith("VmHWM:"):
+            return int(line.split()[1]) / 1024.0
+    return None
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _ingest_file(storage, engine, source, limit: int) -> int:
+    """
+    Pushes up to `limit` ticks from a file through the same
+    decode/normalize/batched idempotent insert path as /ingest-replay,
+    without replay pacing. Returns the number of ticks read.
+    """
+    from backend.config import INGEST_BATCH_SIZE
+    from backend.replay_engine import normalize_tick
+
+    count = 0
+    batch = []
+    offset = 0
+    for offset, tick in engine.read_ticks():
+        row = normalize_tick(tick)
+        if row is None:
+            continue
+        batch.append(row)
+        count += 1
+        if len(batch) >= INGEST_BATCH_SIZE:
+            storage.insert_ticks(batch, source, offset)
+            batch = []
+        if count >= limit:
+            break
+    storage.insert_ticks(batch, source, offset)
+
+    return count
+
+
+def bench_ingest(
+    ndjson_path: Path,
+    db_path: Path,
+    sample: int,
+    symbols,
+    rate: float,
+    seed: int
+) -> dict:
+    """
+    Ingest throughput against the bulk-loaded table, so the dedupe
+    anti-join and inserts run at the benchmarked table size.
+
+    Appends `sample` new ticks (trade ids and timestamps after the
+    loaded range), then re-ingests a slice of already loaded ticks,
+    which are all skipped as duplicates.
+    """
+    from backend.replay_engine import TickReplayEngine
+    from backend.storage import DuckDBStorage
+
+    storage = DuckDBStorage(db_path)
+    table_rows, last_ms, last_trade_id = storage.conn.execute(
+        "SELECT COUNT(*), epoch_ms(MAX(ts)), MAX(trade_id) FROM ticks"
+    ).fetchone()
+
+    append_path = ndjson_path.with_name("append.ndjson")
+    generate_ticks(
+        append_path, sample, symbols=symbols, rate=rate, seed=seed + 1,
+        start_ms=last_ms + 1, start_trade_id=last_trade_id + 1,
+    )
+
+    start = time.perf_counter()
+    count = _ingest_file(
+        storage, TickReplayEngine(append_path), append_path.name, sample
+    )
+    elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    duplicates = _ingest_file(
+        storage, TickReplayEngine(ndjson_path), ndjson_path.name, sample
+    )
+    dedupe_elapsed = time.perf_counter() - start
+
+    inserted = storage.conn.execute("SELECT COUNT(*) FROM ticks").fetchone()[0] - table_rows
+    storage.conn.close()
+    append_path.unlink()
+
+    return {
+        "table_rows": table_rows,
+        "ticks": count,
+        "ticks_inserted": inserted,
+        "seconds": elapsed,
+        "ticks_per_sec": count / elapsed if elapsed else None,
+        "dedupe_ticks": duplicates,
+        "dedupe_ticks_per_sec": duplicates / dedupe_elapsed if dedupe_elapsed else None,
+    }
+
+
+def bulk_load(ndjson_path: Path, db_path: Path) -> dict:
+    """
+    Loads the full file with DuckDB's NDJSON reader so query
+    benchmarks can run at sizes the batched ingest path cannot reach.
+    """
+    from backend.storage import DuckDBStorage
+
+    storage = DuckDBStorage(db_path)
+    storage.conn.execute("DELETE FROM ticks")
+    storage.conn.execute("DELETE FROM ingest_checkpoints")
+
+    start = time.perf_counter()
+    storage.conn.execute(
+        """
+        INSERT INTO ticks (symbol, ts, price, size, trade_id)
+        SELECT
+            s AS symbol,
+            make_timestamp(CAST(E AS BIGINT) * 1000) AS ts,
+            CAST(p AS DOUBLE) AS price,
+            CAST(q AS DOUBLE) AS size,
+            CAST(t AS BIGINT) AS trade_id
+        FROM read_json_auto(?, format = 'newline_delimited')
+        """,
+        [str(ndjson_path)],
+    )
+    elapsed = time.perf_counter() - start
+
+    rows = storage.conn.execute("SELECT COUNT(*) FROM ticks").fetchone()[0]
+
+    bars = {}
+    for timeframe in TIMEFRAMES:
+        samples = []
+        for _ in range(3):
+            t0 = time.perf_counter()
+            df = storage.resample_ohlcv(timeframe)
+            samples.append(time.perf_counter() - t0)
+        bars[timeframe] = {**_latency_summary(samples), "bars": len(df)}
+        del df
+
+    storage.conn.close()
+
+    return {
+        "load": {
+            "ticks": rows,
+            "seconds": elapsed,
+            "ticks_per_sec": rows / elapsed if elapsed else None,
+        },
+        "resample": bars,
+    }
+
+
+def bench_api(db_path: Path, requests: int, symbols) -> dict:
+    """
+    /analytics/pairs latency through a local uvicorn worker.
+    """
+    port = _free_port()
+    env = {**os.environ, "QRA_DB_PATH": str(db_path)}
+
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "backend.app:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--log-level", "warning",
+        ],
+        cwd=BASE_DIR,
+        env=env,
+    )
+
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                urllib.request.urlopen(f"{base}/", timeout=1).read()
+                break
+            except OSError:
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("uvicorn did not become ready")
+                time.sleep(0.1)
+
+        url = (
+            f"{base}/analytics/pairs?symbol_x={symbols[0]}"
+            f"&symbol_y={symbols[1]}&timeframe=1m&window=30"
+        )
+
+        # Warm-up request excluded from the timings
+        urllib.request.urlopen(url, timeout=600).read()
+
+        samples = []
+        payload_bytes = 0
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            body = urllib.request.urlopen(url, timeout=600).read()
+            samples.append(time.perf_counter() - t0)
+            payload_bytes = len(body)
+
+        return {
+            **_latency_summary(samples),
+            "payload_bytes": payload_bytes,
+            "server_peak_rss_mb": _proc_peak_rss_mb(server.pid),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run_single(args) -> dict:
+    """
+    Benchmarks one tick count; runs inside a dedicated subprocess.
+    """
+    symbols = args.symbols.split(",")
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as tmp:
+        tmp = Path(tmp)
+        ndjson_path = tmp / "ticks.ndjson"
+        db_path = tmp / "bench.duckdb"
+
+        t0 = time.perf_counter()
+        generate_ticks(
+            ndjson_path, args.single, symbols=symbols,
+            rate=args.rate, seed=args.seed,
+        )
+        generate_seconds = time.perf_counter() - t0
+
+        result = {
+            "ticks": args.single,
+            "generate_seconds": generate_seconds,
+            "file_bytes": ndjson_path.stat().st_size,
+        }
+        result.update(bulk_load(ndjson_path, db_path))
+        result["ingest"] = bench_ingest(
+            ndjson_path, db_path, min(args.ingest_sample, args.single),
+            symbols, args.rate, args.seed,
+        )
+
+        if not args.skip_api:
+            result["api_pairs"] = bench_api(db_path, args.api_requests, symbols)
+
+        result["peak_rss_mb"] = _peak_rss_mb()
+
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=BASE_DIR, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict):
+    """
+    Prints relative change of the headline numbers per tick count.
+    """
+    def headline(run):
+        out = {"ingest.ticks_per_sec": run["ingest"]["ticks_per_sec"]}
+        for timeframe, stats in run["resample"].items():
+            out[f"resample.{timeframe}.p50_ms"] = stats["p50_ms"]
+        if "api_pairs" in run:
+            out["api_pairs.p50_ms"] = run["api_pairs"]["p50_ms"]
+            out["api_pairs.p99_ms"] = run["api_pairs"]["p99_ms"]
+        out["peak_rss_mb"] = run["peak_rss_mb"]
+        return out
+
+    base_runs = {r["ticks"]: r for r in baseline["results"]}
+
+    for run in current["results"]:
+        base = base_runs.get(run["ticks"])
+        if base is None:
+            continue
+        print(f"== {run['ticks']:,} ticks")
+        old, new = headline(base), headline(run)
+        for key, value in new.items():
+            prev = old.get(key)
+            if not prev or value is None:
+                continue
+            print(f"  {key:<28} {prev:>12.2f} -> {value:>12.2f} ({(value - prev) / prev:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000000,10000000,100000000")
+    parser.add_argument("--symbols", default=",".join(DEFAULT_SYMBOLS))
+    parser.add_argument("--rate", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ingest-sample", type=int, default=100_000,
+                        help="ticks appended (and re-ingested) through the "
+                             "batched ingest path after the bulk load")
+    parser.add_argument("--api-requests", type=int, default=50)
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--workdir", default=None,
+                        help="scratch directory for NDJSON and DuckDB files")
+    parser.add_argument("--output", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None,
+                        help="previous results JSON to diff against")
+    parser.add_argument("--single", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        json.dump(run_single(args), sys.stdout)
+        return
+
+    results = []
+    for size in (int(float(s)) for s in args.sizes.split(",")):
+        print(f"running {size:,} ticks...", file=sys.stderr)
+        cmd = [
+            sys.executable, "-m", "benchmarks.run",
+            "--single", str(size),
+            "--symbols", args.symbols,
+            "--rate", str(args.rate),
+            "--seed", str(args.seed),
+            "--ingest-sample", str(args.ingest_sample),
+            "--api-requests", str(args.api_requests),
+        ]
+        if args.skip_api:
+            cmd.append("--skip-api")
+        if args.workdir:
+            cmd += ["--workdir", args.workdir]
+
+        out = subprocess.check_output(cmd, cwd=BASE_DIR, text=True)
+        results.append(json.loads(out))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {
+                "symbols": args.symbols,
+                "rate": args.rate,
+                "seed": args.seed,
+                "ingest_sample": args.ingest_sample,
+                "api_requests": args.api_requests,
+            },
+        },
+        "results": results,
+    }
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = RESULTS_DIR / f"bench_{stamp}.json"
+
+    output.write_text(json.dumps(report, indent=2))
+    print(f"wrote {output}", file=sys.stderr)
+
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+API cold-start benchmark.
+
+Measures, over several fresh interpreters:
+- time to import backend.app, and which heavy modules it pulls in
+- time from launching uvicorn until GET / answers
+
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+from benchmarks.run import BASE_DIR, _free_port, _latency_summary
+
+
+HEAVY_MODULES = ("pandas", "numpy", "duckdb", "statsmodels", "pyarrow")
+
+_IMPORT_PROBE = f"""
+import json, sys, time
+t0 = time.perf_counter()
+import backend.app
+elapsed = time.perf_counter() - t0
+loaded = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy_modules_loaded": loaded}}))
+"""
+
+
+def measure_import(env: dict) -> dict:
+    out = subprocess.check_output(
+        [sys.executable, "-c", _IMPORT_PROBE], cwd=BASE_DIR, env=env, text=True
+    )
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure_first_response(env: dict, timeout: float = 60.0) -> float:
+    port = _free_port()
+
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "backend.app:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--log-level", "warning",
+        ],
+        cwd=BASE_DIR,
+        env=env,
+    )
+
+    try:
+        while True:
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+                return time.perf_counter() - start
+            except OSError:
+                if time.perf_counter() - start > timeout or server.poll() is not None:
+                    raise RuntimeError("uvicorn did not become ready")
+                time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true",
+                        help="enable the background warm-up thread")
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "QRA_DB_PATH": str(Path(tmp) / "startup.duckdb"),
+            "QRA_WARMUP": "1" if args.warmup else "0",
+        }
+
+        imports = [measure_import(env) for _ in range(args.runs)]
+        first_response = [measure_first_response(env) for _ in range(args.runs)]
+
+    report = {
+        "runs": args.runs,
+        "warmup": args.warmup,
+        "import_app": {
+            **_latency_summary([r["seconds"] for r in imports]),
+            "heavy_modules_loaded": imports[-1]["heavy_modules_loaded"],
+        },
+        "first_health_response": _latency_summary(first_response),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,16 @@ import requests
 import pandas as pd
 import plotly.graph_objects as go
 import time
+from urllib.parse import urlencode
 
 API_BASE = "https://quant-realtime-analytics.onrender.com"
 
+# Points per chart trace requested from the API; a wide-layout chart is
+# ~1500px across, so more points than this are not visible anyway.
+CHART_POINTS_OPTIONS = [500, 1000, 1500, 3000, 5000]
+DEFAULT_CHART_POINTS = 1500
+
+
 # -----------------------------
 # Page config & global styling
 # -----------------------------
@@ -59,6 +66,13 @@ with st.sidebar.expander("Backtest Settings", expanded=True):
     exit_z = st.slider("Exit Z-Score", 0.0, 1.5, 0.0, 0.1)
     position_size = st.number_input("Position Size ($)", 100, 100000, 1000, step=100)
 
+with st.sidebar.expander("Display", expanded=False):
+    chart_points = st.select_slider(
+        "Chart resolution (points)",
+        options=CHART_POINTS_OPTIONS,
+        value=DEFAULT_CHART_POINTS,
+    )
+
 
 st.sidebar.markdown("---")
 run = st.sidebar.button("▶ Run Analytics", width="stretch")
@@ -72,15 +86,25 @@ refresh_sec = st.sidebar.slider("Refresh interval (sec)", 1, 10, 3)
 # -----------------------------
 if run:
 
+    analytics_params = {
+        "symbol_x": symbol_x,
+        "symbol_y": symbol_y,
+        "timeframe": timeframe,
+        "window": window,
+    }
+
+    backtest_params = {
+        "entry_z": entry_z,
+        "exit_z": exit_z,
+        "position_size": position_size,
+    }
+
+    # The backtest runs server-side on every bar; only its curve and
+    # entries come back, downsampled like the charts
     with st.spinner("Fetching analytics..."):
         resp = requests.get(
             f"{API_BASE}/analytics/pairs",
-            params={
-                "symbol_x": symbol_x,
-                "symbol_y": symbol_y,
-                "timeframe": timeframe,
-                "window": window,
-            },
+            params={**analytics_params, **backtest_params, "max_points": chart_points},
         )
 
     if resp.status_code != 200:
@@ -99,64 +123,25 @@ if run:
     if df.empty:
         st.warning("Not enough data to display analytics.")
         st.stop()
-    # -----------------------------
-# Backtest Logic
-# -----------------------------
-    df_bt = df.copy()
-    df_bt["position"] = 0
-    df_bt["pnl"] = 0.0
-
-    position = 0
-
-    for i in range(1, len(df_bt)):
-        z = df_bt.loc[i, "zscore"]
-        spread = df_bt.loc[i, "spread"]
-        prev_spread = df_bt.loc[i - 1, "spread"]
 
-    # Entry
-        if position == 0:
-            if z > entry_z:
-                position = -1
-            elif z < -entry_z:
-                position = 1
-
-    # Exit
-        elif abs(z) <= exit_z:
-            position = 0
-
-        df_bt.loc[i, "position"] = position
-        df_bt.loc[i, "pnl"] = position * (spread - prev_spread)
-
-    df_bt["cum_pnl"] = df_bt["pnl"].cumsum() * position_size
+    bt = result["backtest"]
+    pnl_plot = pd.DataFrame(bt["cum_pnl"])
+    entries = pd.DataFrame(bt["entries"], columns=["bar_ts", "zscore", "side"])
 
     st.subheader("Backtest Performance")
 
-    total_pnl = df_bt["cum_pnl"].iloc[-1]
-    max_dd = (df_bt["cum_pnl"].cummax() - df_bt["cum_pnl"]).max()
-    trades = (df_bt["position"].diff().abs() == 1).sum()
-
-    # Performance Metrics
-    returns = df_bt["pnl"]
-    sharpe = (
-        returns.mean() / returns.std() * (252 ** 0.5)
-        if returns.std() != 0 else 0
-    )
-
-    wins = (df_bt["pnl"] > 0).sum()
-    win_rate = wins / trades * 100 if trades > 0 else 0
-
     m1, m2, m3, m4 = st.columns(4)
-    m1.metric("Total PnL ($)", f"{total_pnl:,.2f}")
-    m2.metric("Max Drawdown ($)", f"{max_dd:,.2f}")
-    m3.metric("Sharpe Ratio", f"{sharpe:.2f}")
-    m4.metric("Win Rate (%)", f"{win_rate:.1f}")
+    m1.metric("Total PnL ($)", f"{bt['total_pnl']:,.2f}")
+    m2.metric("Max Drawdown ($)", f"{bt['max_drawdown']:,.2f}")
+    m3.metric("Sharpe Ratio", f"{bt['sharpe']:.2f}")
+    m4.metric("Win Rate (%)", f"{bt['win_rate']:.1f}")
 
 
     fig_pnl = go.Figure()
     fig_pnl.add_trace(
         go.Scatter(
-            x=df_bt["bar_ts"],
-            y=df_bt["cum_pnl"],
+            x=pnl_plot["bar_ts"],
+            y=pnl_plot["cum_pnl"],
             mode="lines",
             name="Cumulative PnL"
         )
@@ -170,11 +155,11 @@ if run:
 
     st.plotly_chart(fig_pnl, width="stretch", key="pnl_chart")
 
-    st.download_button(
+    # Per-bar results are only fetched when the user downloads them
+    st.link_button(
         "📥 Download Backtest Results",
-        df_bt.to_csv(index=False),
-        file_name="backtest_results.csv",
-        mime="text/csv"
+        f"{API_BASE}/analytics/pairs/backtest.csv?"
+        + urlencode({**analytics_params, **backtest_params}),
     )
 
     # -----------------------------
@@ -210,7 +195,7 @@ if run:
             st.metric("ADF Test", "Waiting")
 
     with c3:
-        st.metric("Bars Used", len(df))
+        st.metric("Bars Used", bt["bars"])
 
     with c4:
         st.metric("Latest Z-Score", f"{latest_z:.2f}")
@@ -239,7 +224,7 @@ if run:
     # -----------------------------
     bars_resp = requests.get(
         f"{API_BASE}/bars/{timeframe}",
-        params={"symbol": symbol_x},
+        params={"symbol": symbol_x, "max_points": chart_points},
     )
 
     bars_df = pd.DataFrame(bars_resp.json())
@@ -288,8 +273,8 @@ if run:
         ))
 
     # Entry markers
-        entries_long = df_bt[df_bt["position"].diff() == 1]
-        entries_short = df_bt[df_bt["position"].diff() == -1]
+        entries_long = entries[entries["side"] == "long"]
+        entries_short = entries[entries["side"] == "short"]
 
         fig_z.add_trace(go.Scatter(
             x=entries_long["bar_ts"],